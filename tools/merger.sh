@@ -88,3 +88,6 @@ python3 hard-to-parse-strings.py ../scripts_merge/S0106.U.CC
 
 
 
+
+# Memory budget
+python3 xenbudget.py -l budget.txt ../scripts_merge
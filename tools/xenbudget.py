@@ -0,0 +1,249 @@
+#!/bin/python
+#
+# Memory budget for the translated scripts
+#
+# The game loads every script into a fixed real-mode buffer, so
+# a .U.CC (or its compressed .CC) bigger than the original crashes
+# the emulator. The budget of every script is taken from the
+# original files in scripts_cc, plus an optional headroom, or from
+# a limits file for the scripts whose real limit is known.
+#
+# Limits file, one script per line, '-' for no limit:
+#   S0104   26000   12500   # uncompressed, compressed
+#   S0106   42000   -
+#
+
+import sys
+import argparse
+from pathlib import Path
+
+import xenlzss
+
+
+def load_budget(scripts_dir, name):
+    """
+    Returns (uncompressed, compressed) sizes of the original script,
+    None for any of the two files that is missing
+    Ex: load_budget("../scripts_cc", "S0104") -> (24892, 11832)
+    """
+    scripts_dir = Path(scripts_dir)
+
+    uncompressed_path = scripts_dir / (name + ".U.CC")
+    compressed_path = scripts_dir / (name + ".CC")
+
+    uncompressed = uncompressed_path.stat().st_size if uncompressed_path.exists() else None
+    compressed = compressed_path.stat().st_size if compressed_path.exists() else None
+
+    return uncompressed, compressed
+
+
+def load_limits(filename):
+    """
+    {
+        "S0104": (uncompressed, compressed), ...
+    }
+    """
+    limits = {}
+
+    with open(filename, "r", encoding="utf-8") as f:
+        for line in f:
+            fields = line.split("#")[0].split()
+            if not fields:
+                continue
+            if len(fields) != 3:
+                raise ValueError(f"{filename}: bad limit line: {line.strip()}")
+            name, uncompressed, compressed = fields
+            limits[name] = tuple(None if value == "-" else int(value) for value in (uncompressed, compressed))
+
+    return limits
+
+
+def get_budget(scripts_dir, name, limits=None, headroom=0.0):
+    """
+    Explicit limit of the script if any, otherwise the original sizes
+    plus headroom (in percent)
+    Ex: get_budget("../scripts_cc", "S0104", headroom=5) -> (26136, 12423)
+    """
+    if limits and name in limits:
+        return limits[name]
+
+    return tuple(
+        None if size is None else int(size * (100 + headroom) / 100)
+        for size in load_budget(scripts_dir, name)
+    )
+
+
+def write_limits(filename, reports, scripts_dir):
+    """
+    Limits file from a build known to work: the biggest of the original
+    and the current sizes of every script
+    """
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write("# Memory limits for xenbudget.py: name, uncompressed, compressed ('-' for no limit)\n")
+        f.write("# Sizes of the last build tested in the emulator, or the original ones when bigger\n")
+        for report in reports:
+            original = load_budget(scripts_dir, report["name"])
+            sizes = [
+                str(size if budget is None else max(size, budget))
+                for size, budget in zip((report["size"], report["compressed"]), original)
+            ]
+            f.write(f"{report['name']:<8}{sizes[0]:<8}{sizes[1]}\n")
+
+
+def script_name(path):
+    """
+    S0104.U.CC -> S0104
+    """
+    return Path(path).name.split(".")[0]
+
+
+def check_budget(name, data: bytes, budget):
+    """
+    Computes the sizes of a translated script and compares them with the budget
+    Returns a dictionary:
+    {
+        "name", "size", "compressed", "budget", "compressed_budget", "over"
+    }
+    """
+    uncompressed_budget, compressed_budget = budget
+
+    size = len(data)
+    compressed = len(xenlzss.encode(data))
+
+    over = False
+    if uncompressed_budget is not None and size > uncompressed_budget:
+        over = True
+    if compressed_budget is not None and compressed > compressed_budget:
+        over = True
+
+    return {
+        "name": name,
+        "size": size,
+        "compressed": compressed,
+        "budget": uncompressed_budget,
+        "compressed_budget": compressed_budget,
+        "over": over,
+    }
+
+
+def format_report(report) -> str:
+    status = "OVER BUDGET" if report["over"] else "ok"
+    return (
+        f"[{status}] {report['name']}: "
+        f"{report['size']}/{report['budget']} bytes, "
+        f"compressed {report['compressed']}/{report['compressed_budget']} bytes"
+    )
+
+
+def record_growth(growth: dict, japanese, original: bytes, translated: bytes):
+    """
+    Accumulates how many bytes a translated line adds to the script
+    {
+        "Japanese sentence": [occurrences, total growth in bytes]
+    }
+    """
+    entry = growth.setdefault(japanese, [0, 0])
+    entry[0] += 1
+    entry[1] += len(translated) - len(original)
+
+
+def rank_growth(growth: dict, top=10):
+    """
+    Lines sorted by the bytes they add, biggest first
+    Returns [(japanese, occurrences, growth), ...]
+    """
+    ranking = sorted(
+        ((japanese, count, delta) for japanese, (count, delta) in growth.items()),
+        key=lambda entry: entry[2],
+        reverse=True
+    )
+    return [entry for entry in ranking[:top] if entry[2] > 0]
+
+
+def print_growth(growth: dict, top=10):
+    for japanese, count, delta in rank_growth(growth, top):
+        print(f"    +{delta} bytes ({count}x) //{japanese}")
+
+
+# ------------------------------------------------------------
+# Main
+# ------------------------------------------------------------
+
+if __name__ == "__main__":
+    """
+    Checks every script in scripts_merge against the originals
+    - Exits with 1 when any script is over budget and --strict is given
+    """
+    parser = argparse.ArgumentParser(description="Check translated scripts against their memory budget.")
+
+    parser.add_argument(
+        "merge_dir",
+        nargs="?",
+        default="../scripts_merge",
+        help="Directory with the translated .U.CC files. Default: (../scripts_merge)"
+    )
+
+    parser.add_argument(
+        "-b", "--budget-dir",
+        default="../scripts_cc",
+        help="Directory with the original files. Default: (../scripts_cc)"
+    )
+
+    parser.add_argument(
+        "-l", "--limits",
+        help="Per script limits file, used instead of the original sizes for the scripts it lists."
+    )
+
+    parser.add_argument(
+        "--headroom",
+        type=float,
+        default=0.0,
+        help="Percent added to the original sizes. Default: (0)"
+    )
+
+    parser.add_argument(
+        "-w", "--write-limits",
+        help="Write a limits file with the current sizes (only for a build that works in the emulator)."
+    )
+
+    parser.add_argument(
+        "-s", "--strict",
+        action="store_true",
+        help="Fail when a script is over budget."
+    )
+
+    parser.add_argument(
+        "-v", "--verbose",
+        action="store_true",
+        help="Display every script, not only the ones over budget."
+    )
+
+    args = parser.parse_args()
+
+    limits = load_limits(args.limits) if args.limits else {}
+    over_budget = []
+    reports = []
+
+    for path in sorted(Path(args.merge_dir).glob("*.U.CC")):
+        name = script_name(path)
+
+        with open(path, "rb") as f:
+            data = f.read()
+
+        report = check_budget(name, data, get_budget(args.budget_dir, name, limits, args.headroom))
+        reports.append(report)
+
+        if report["over"]:
+            over_budget.append(name)
+
+        if report["over"] or args.verbose:
+            print(format_report(report))
+
+    if args.write_limits:
+        write_limits(args.write_limits, reports, args.budget_dir)
+        print(f"Limits of {len(reports)} script(s) written to {args.write_limits}")
+
+    if over_budget:
+        print(f"{len(over_budget)} script(s) over budget: {' '.join(over_budget)}")
+        if args.strict:
+            sys.exit(1)
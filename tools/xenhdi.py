@@ -0,0 +1,472 @@
+#!/bin/python
+#
+# Read-only browser for the Anex86 .HDI images in ../game
+#
+# Parses the PC-98 partition table and the FAT directory once,
+# and caches the directory and the cluster map of every file
+# (keyed by the SHA-1 of the image), so listing and extracting
+# don't need editdisk.exe.
+#
+# Extracted .CC files can be LZSS decoded as well, writing
+# both NAME.CC and NAME.U.CC like in ../scripts_cc
+#
+
+import json
+import struct
+import hashlib
+import argparse
+import fnmatch
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import xenlzss
+
+CACHE_VERSION = 1
+
+ATTR_VOLUME = 0x08
+ATTR_DIRECTORY = 0x10
+ATTR_LFN = 0x0F
+
+
+# ------------------------------------------------------------
+# Image layout
+# ------------------------------------------------------------
+
+def image_hash(image_path):
+    """
+    SHA-1 of the whole image, used as cache key
+    """
+    sha1 = hashlib.sha1()
+    with open(image_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def read_hdi_header(f):
+    """
+    Anex86 header, 8 little endian dwords:
+        dummy, hddtype, headersize, hddsize, sectorsize, sectors, surfaces, cylinders
+    """
+    f.seek(0)
+    fields = struct.unpack("<8I", f.read(32))
+    header = dict(zip(
+        ("dummy", "hddtype", "headersize", "hddsize", "sectorsize", "sectors", "surfaces", "cylinders"),
+        fields
+    ))
+
+    if header["sectorsize"] not in (256, 512, 1024) or header["headersize"] == 0:
+        raise ValueError("Not an Anex86 HDI image")
+
+    return header
+
+
+def parse_bpb(sector: bytes):
+    """
+    FAT BIOS parameter block, None if the sector doesn't hold one
+    """
+    if len(sector) < 0x24 or sector[0] not in (0xEB, 0xE9):
+        return None
+
+    (bytes_per_sector, sectors_per_cluster, reserved, fats,
+     root_entries, total16, media, fat_size) = struct.unpack_from("<HBHBHHBH", sector, 0x0B)
+    total32 = struct.unpack_from("<I", sector, 0x20)[0]
+
+    if bytes_per_sector not in (256, 512, 1024, 2048) or sectors_per_cluster == 0:
+        return None
+    if fats == 0 or fat_size == 0 or root_entries == 0:
+        return None
+
+    return {
+        "bytes_per_sector": bytes_per_sector,
+        "sectors_per_cluster": sectors_per_cluster,
+        "reserved": reserved,
+        "fats": fats,
+        "root_entries": root_entries,
+        "total_sectors": total16 if total16 else total32,
+        "media": media,
+        "fat_size": fat_size,
+    }
+
+
+def find_partitions(f, header):
+    """
+    Byte offsets of the DOS partitions in the PC-98 partition table
+    (second sector of the disk, 32 bytes per entry)
+    """
+    sector_size = header["sectorsize"]
+    table_offset = header["headersize"] + max(sector_size, 512)
+
+    f.seek(table_offset)
+    table = f.read(16 * 32)
+
+    partitions = []
+    for i in range(0, len(table), 32):
+        mid = table[i]
+        if mid == 0:
+            continue
+
+        ssect, shd, scyl = struct.unpack_from("<BBH", table, i + 8)
+        lba = (scyl * header["surfaces"] + shd) * header["sectors"] + ssect
+        partitions.append(header["headersize"] + lba * sector_size)
+
+    return partitions
+
+
+def find_filesystem(f, header, offset=None):
+    """
+    Returns (offset, bpb) of the FAT filesystem in the image
+    - The given offset
+    - Otherwise the partitions from the partition table
+    - Otherwise the image without partitions
+    """
+    if offset is not None:
+        candidates = [offset]
+    else:
+        candidates = find_partitions(f, header) + [header["headersize"]]
+
+    for candidate in candidates:
+        f.seek(candidate)
+        bpb = parse_bpb(f.read(64))
+        if bpb:
+            return candidate, bpb
+
+    raise ValueError("No FAT filesystem found in image, try --offset")
+
+
+# ------------------------------------------------------------
+# FAT
+# ------------------------------------------------------------
+
+def read_fat(f, offset, bpb):
+    """
+    Returns (fat_bytes, is_fat12, data_offset, cluster_size, root_offset)
+    """
+    sector = bpb["bytes_per_sector"]
+
+    fat_offset = offset + bpb["reserved"] * sector
+    f.seek(fat_offset)
+    fat = f.read(bpb["fat_size"] * sector)
+
+    root_offset = fat_offset + bpb["fats"] * bpb["fat_size"] * sector
+    root_size = bpb["root_entries"] * 32
+    data_offset = root_offset + ((root_size + sector - 1) // sector) * sector
+
+    cluster_size = bpb["sectors_per_cluster"] * sector
+    data_sectors = bpb["total_sectors"] - (data_offset - offset) // sector
+    is_fat12 = data_sectors // bpb["sectors_per_cluster"] < 4085
+
+    return fat, is_fat12, data_offset, cluster_size, root_offset
+
+
+def next_cluster(fat: bytes, is_fat12, cluster):
+    if is_fat12:
+        value = struct.unpack_from("<H", fat, cluster + cluster // 2)[0]
+        value = value >> 4 if cluster & 1 else value & 0xFFF
+        return None if value >= 0xFF8 else value
+
+    value = struct.unpack_from("<H", fat, cluster * 2)[0]
+    return None if value >= 0xFFF8 else value
+
+
+def cluster_runs(fat, is_fat12, data_offset, cluster_size, first_cluster, size=None):
+    """
+    Cluster chain as a list of [image_offset, length] runs,
+    contiguous clusters are merged into a single run
+    """
+    runs = []
+    cluster = first_cluster
+    seen = set()
+    remaining = size
+
+    while cluster is not None and 2 <= cluster and cluster not in seen:
+        if remaining is not None and remaining <= 0:
+            break
+        seen.add(cluster)
+
+        start = data_offset + (cluster - 2) * cluster_size
+        length = cluster_size if remaining is None else min(cluster_size, remaining)
+
+        if runs and runs[-1][0] + runs[-1][1] == start:
+            runs[-1][1] += length
+        else:
+            runs.append([start, length])
+
+        if remaining is not None:
+            remaining -= length
+        cluster = next_cluster(fat, is_fat12, cluster)
+
+    return runs
+
+
+def read_runs(f, runs) -> bytes:
+    data = bytearray()
+    for start, length in runs:
+        f.seek(start)
+        data.extend(f.read(length))
+    return bytes(data)
+
+
+def entry_name(entry: bytes) -> str:
+    name = bytearray(entry[0:8])
+    if name[0] == 0x05:
+        name[0] = 0xE5
+    name = bytes(name).decode("cp932", errors="replace").rstrip()
+    ext = entry[8:11].decode("cp932", errors="replace").rstrip()
+    return name + "." + ext if ext else name
+
+
+def walk_directory(f, directory: bytes, prefix, fat_info, files):
+    """
+    Reads the directory entries, recursing into subdirectories
+    """
+    fat, is_fat12, data_offset, cluster_size, _ = fat_info
+
+    for i in range(0, len(directory) - 31, 32):
+        entry = directory[i:i + 32]
+
+        if entry[0] == 0x00:
+            break
+        if entry[0] == 0xE5:
+            continue
+
+        attr = entry[11]
+        if attr == ATTR_LFN or attr & ATTR_VOLUME:
+            continue
+
+        name = entry_name(entry)
+        if name in (".", ".."):
+            continue
+
+        first_cluster = struct.unpack_from("<H", entry, 26)[0]
+        size = struct.unpack_from("<I", entry, 28)[0]
+        path = prefix + name
+
+        if attr & ATTR_DIRECTORY:
+            runs = cluster_runs(fat, is_fat12, data_offset, cluster_size, first_cluster)
+            walk_directory(f, read_runs(f, runs), path + "/", fat_info, files)
+            continue
+
+        files.append({
+            "path": path,
+            "size": size,
+            "attr": attr,
+            "cluster": first_cluster,
+            "runs": cluster_runs(fat, is_fat12, data_offset, cluster_size, first_cluster, size),
+        })
+
+
+def build_index(image_path, offset=None, digest=None):
+    """
+    Directory and cluster map of the image:
+    {
+        "version", "image", "sha1", "offset", "bpb",
+        "files": [{"path", "size", "attr", "cluster", "runs"}, ...]
+    }
+    """
+    with open(image_path, "rb") as f:
+        header = read_hdi_header(f)
+        fs_offset, bpb = find_filesystem(f, header, offset)
+
+        fat_info = read_fat(f, fs_offset, bpb)
+        root_offset = fat_info[4]
+
+        f.seek(root_offset)
+        root = f.read(bpb["root_entries"] * 32)
+
+        files = []
+        walk_directory(f, root, "", fat_info, files)
+
+    return {
+        "version": CACHE_VERSION,
+        "image": str(image_path),
+        "sha1": digest if digest else image_hash(image_path),
+        "offset": fs_offset,
+        "bpb": bpb,
+        "files": files,
+    }
+
+
+def load_index(image_path, cache_dir, offset=None):
+    """
+    Index of the image from the cache, parsed and cached when missing
+    """
+    digest = image_hash(image_path)
+    cache_path = Path(cache_dir) / (digest + ".json")
+
+    if cache_path.exists():
+        with open(cache_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") == CACHE_VERSION and (offset is None or index["offset"] == offset):
+            return index
+
+    index = build_index(image_path, offset, digest)
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(cache_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=1)
+
+    return index
+
+
+def select_files(index, patterns):
+    """
+    Files matching any of the patterns (case insensitive), all if none given
+    Ex: select_files(index, ["S01*.CC"])
+    """
+    if not patterns:
+        return index["files"]
+
+    patterns = [pattern.upper() for pattern in patterns]
+    return [
+        entry for entry in index["files"]
+        if any(fnmatch.fnmatchcase(entry["path"].upper(), pattern) or
+               fnmatch.fnmatchcase(entry["path"].upper().split("/")[-1], pattern)
+               for pattern in patterns)
+    ]
+
+
+# ------------------------------------------------------------
+# Extraction
+# ------------------------------------------------------------
+
+def read_file(image_path, entry) -> bytes:
+    with open(image_path, "rb") as f:
+        return read_runs(f, entry["runs"])
+
+
+def extract_file(image_path, entry, output_dir, decode=False):
+    """
+    Writes one file of the image to output_dir, keeping its path
+    With decode, .CC files are also written decoded as .U.CC
+    Returns the list of written paths
+    """
+    data = read_file(image_path, entry)
+
+    output_path = Path(output_dir) / entry["path"]
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(output_path, "wb") as f:
+        f.write(data)
+
+    written = [str(output_path)]
+
+    if decode and output_path.suffix.upper() == ".CC" and len(data) > xenlzss.HEADER_SIZE:
+        decoded_path = output_path.with_name(output_path.stem + ".U" + output_path.suffix)
+        with open(decoded_path, "wb") as f:
+            f.write(xenlzss.decode(data))
+        written.append(str(decoded_path))
+
+    return written
+
+
+def extract_files(image_path, entries, output_dir, decode=False, jobs=None):
+    """
+    Extracts the files in parallel, one process per file
+    """
+    written = []
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(extract_file, str(image_path), entry, str(output_dir), decode)
+            for entry in entries
+        ]
+        for future in futures:
+            written.extend(future.result())
+    return written
+
+
+def file_digest(image_path, entry):
+    return entry["path"], hashlib.sha1(read_file(image_path, entry)).hexdigest()
+
+
+def compare_images(image_a, index_a, image_b, index_b, patterns=(), jobs=None):
+    """
+    Returns {"path": status} for files only in one image or with different content
+    """
+    files_a = {entry["path"]: entry for entry in select_files(index_a, patterns)}
+    files_b = {entry["path"]: entry for entry in select_files(index_b, patterns)}
+
+    differences = {}
+
+    for path in sorted(set(files_a) - set(files_b)):
+        differences[path] = "only in " + Path(image_a).name
+    for path in sorted(set(files_b) - set(files_a)):
+        differences[path] = "only in " + Path(image_b).name
+
+    common = sorted(set(files_a) & set(files_b))
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        digests_a = dict(executor.map(file_digest, [str(image_a)] * len(common), [files_a[path] for path in common]))
+        digests_b = dict(executor.map(file_digest, [str(image_b)] * len(common), [files_b[path] for path in common]))
+
+    for path in common:
+        if digests_a[path] != digests_b[path]:
+            differences[path] = f"differs ({files_a[path]['size']} / {files_b[path]['size']} bytes)"
+
+    return differences
+
+
+# ------------------------------------------------------------
+# Main
+# ------------------------------------------------------------
+
+if __name__ == "__main__":
+    """
+    - 'xenhdi.py ls image [patterns]' lists the files
+    - 'xenhdi.py x image [patterns] -o dir [-d]' extracts (and decodes) the files
+    - 'xenhdi.py diff image1 image2 [patterns]' compares two images
+    """
+    parser = argparse.ArgumentParser(description="Browse and extract files from .HDI images.")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    def add_common(subparser):
+        subparser.add_argument("patterns", nargs="*", help="File patterns, ex: S01*.CC. Default: (all files)")
+        subparser.add_argument(
+            "--cache-dir",
+            default="../game/cache",
+            help="Directory for the cached indexes. Default: (../game/cache)"
+        )
+        subparser.add_argument(
+            "--offset",
+            type=lambda value: int(value, 0),
+            help="Byte offset of the FAT partition in the image. Default: (from partition table)"
+        )
+        subparser.add_argument("-j", "--jobs", type=int, help="Number of worker processes. Default: (CPU count)")
+
+    subparser = subparsers.add_parser("ls", help="List files")
+    subparser.add_argument("image", help="Path to .hdi image (on ../game/)")
+    add_common(subparser)
+
+    subparser = subparsers.add_parser("x", help="Extract files")
+    subparser.add_argument("image", help="Path to .hdi image (on ../game/)")
+    add_common(subparser)
+    subparser.add_argument("-o", "--output", default="../scripts_hdi", help="Output directory. Default: (../scripts_hdi)")
+    subparser.add_argument("-d", "--decode", action="store_true", help="Also write decoded .U.CC files.")
+
+    subparser = subparsers.add_parser("diff", help="Compare two images")
+    subparser.add_argument("image", help="Path to first .hdi image")
+    subparser.add_argument("other_image", help="Path to second .hdi image")
+    add_common(subparser)
+
+    args = parser.parse_args()
+
+    image_path = Path(args.image)
+    index = load_index(image_path, args.cache_dir, args.offset)
+
+    if args.mode == "ls":
+        for entry in select_files(index, args.patterns):
+            print(f"{entry['size']:>10}  {entry['path']}")
+
+    elif args.mode == "x":
+        entries = select_files(index, args.patterns)
+        written = extract_files(image_path, entries, args.output, args.decode, args.jobs)
+        print(f"{len(entries)} file(s) extracted, {len(written)} written to {args.output}")
+
+    else:
+        other_path = Path(args.other_image)
+        other_index = load_index(other_path, args.cache_dir, args.offset)
+
+        differences = compare_images(image_path, index, other_path, other_index, args.patterns, args.jobs)
+        for path, status in differences.items():
+            print(f"{path}: {status}")
+        print(f"{len(differences)} difference(s)")
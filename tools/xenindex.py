@@ -0,0 +1,331 @@
+#!/bin/python
+#
+# Inverted index of the translation keys over ../scripts_cc
+#
+# Every script is split once (in parallel) with the same terminators
+# xenreplacer.py uses, and in lines like its 'line' pass. The Shift-JIS
+# spans are kept with their offset and marker prefix (the byte before
+# 0xFD). Only the scripts that changed since the last run are scanned
+# again.
+#
+# The translation file is applied when querying, so editing it
+# doesn't need any rescan. Answers:
+#   - Which scripts and offsets use this line?
+#   - Which // entries never match anything?
+#   - How much of every script is covered by the translation?
+#
+
+import re
+import json
+import bisect
+import hashlib
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from xenreplacer import load_translations
+
+INDEX_VERSION = 2
+
+# Same terminators as xenreplacer.py, but 0xFD takes any length byte (even 0x0A)
+TERMINATOR_PATTERN = re.compile(rb'\xFD[\x00-\xFF]|\x00|\x0C|\x04|\x05')
+
+# Runs of Shift-JIS starting with a double-byte char, like extra-xenreplacer.py
+SJIS_RUN_PATTERN = re.compile(
+    rb'[\x81-\x9F\xE0-\xFC][\x40-\x7E\x80-\xFC]'
+    rb'(?:[\x81-\x9F\xE0-\xFC][\x40-\x7E\x80-\xFC]|[\x20-\x7E\xA1-\xDF])*'
+)
+
+
+def contains_japanese(text: str) -> bool:
+    """
+    Hiragana, Katakana or Kanji (same ranges as extra-xenreplacer.py)
+    """
+    for ch in text:
+        code = ord(ch)
+        if 0x3040 <= code <= 0x30FF or 0x4E00 <= code <= 0x9FFF:
+            return True
+    return False
+
+
+def iter_lines(offset, prefix, text):
+    """
+    Splits a span in lines, like the 'line' pass of xenreplacer.py
+    (translation keys never hold a line break), the first line keeps the prefix
+    """
+    if "\n" not in text:
+        yield offset, prefix, text
+        return
+
+    for line in text.split("\n"):
+        if line:
+            yield offset, prefix, line
+        offset += len(line.encode("shift_jis")) + 1
+        prefix = None
+
+
+def iter_spans(data: bytes):
+    """
+    Yields (offset, prefix, text) for every span of the script that decodes as Shift-JIS
+    - prefix is the byte before 0xFD <len> for spans behind a marker, None otherwise
+    """
+    intervals = []
+    pos = 0
+    prefix = None
+
+    for match in TERMINATOR_PATTERN.finditer(data):
+        start = match.start()
+        if pos < start:
+            try:
+                text = data[pos:start].decode("shift_jis")
+                intervals.append((pos, start))
+                yield from iter_lines(pos, prefix, text)
+            except UnicodeDecodeError:
+                pass
+
+        terminator = match.group()
+        if terminator[0] == 0xFD and len(terminator) == 2:
+            prefix = data[start - 1] if start > 0 else None
+        else:
+            prefix = None
+        pos = match.end()
+
+    if pos < len(data):
+        try:
+            text = data[pos:].decode("shift_jis")
+            intervals.append((pos, len(data)))
+            yield from iter_lines(pos, prefix, text)
+        except UnicodeDecodeError:
+            pass
+
+    # Strings without terminators around them (caught by extra-xenreplacer.py),
+    # unless they are inside a span already yielded
+    starts = [start for start, _ in intervals]
+    for match in SJIS_RUN_PATTERN.finditer(data):
+        i = bisect.bisect_right(starts, match.start()) - 1
+        if i >= 0 and match.end() <= intervals[i][1]:
+            continue
+        try:
+            yield match.start(), None, match.group().decode("shift_jis")
+        except UnicodeDecodeError:
+            pass
+
+
+def scan_script(path):
+    """
+    Worker: returns (name, entry) with the spans of one script
+    """
+    path = Path(path)
+    with open(path, "rb") as f:
+        data = f.read()
+
+    stat = path.stat()
+    return path.name, {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "sha1": hashlib.sha1(data).hexdigest(),
+        "spans": [list(span) for span in iter_spans(data)],
+    }
+
+
+def file_sha1(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+# ------------------------------------------------------------
+# Index
+# ------------------------------------------------------------
+
+def load_index(index_file):
+    """
+    {
+        "version": 2,
+        "scripts": {"S0104.U.CC": {"size", "mtime", "sha1", "spans": [[offset, prefix, text], ...]}}
+    }
+    """
+    index_file = Path(index_file)
+    if index_file.exists():
+        with open(index_file, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") == INDEX_VERSION:
+            return index
+
+    return {"version": INDEX_VERSION, "scripts": {}}
+
+
+def save_index(index_file, index):
+    with open(index_file, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, separators=(",", ":"))
+
+
+def update_index(index, scripts_dir, pattern="*.U.CC", jobs=None):
+    """
+    Scans again only the scripts that are new or changed, drops the removed ones
+    Returns the names of the scanned scripts
+    """
+    scripts = index["scripts"]
+    paths = {path.name: path for path in sorted(Path(scripts_dir).glob(pattern))}
+
+    for name in list(scripts):
+        if name not in paths:
+            del scripts[name]
+
+    changed = []
+    for name, path in paths.items():
+        entry = scripts.get(name)
+        stat = path.stat()
+
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            continue
+        if entry and entry["size"] == stat.st_size and entry["sha1"] == file_sha1(path):
+            entry["mtime"] = stat.st_mtime
+            continue
+
+        changed.append(path)
+
+    if changed:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for name, entry in executor.map(scan_script, changed):
+                scripts[name] = entry
+
+    return [path.name for path in changed]
+
+
+def invert(index, translations):
+    """
+    Translation key -> occurrences
+    {
+        "Japanese sentence": [(script, offset, prefix), ...]
+    }
+    """
+    inverted = {}
+    for name, entry in index["scripts"].items():
+        for offset, prefix, text in entry["spans"]:
+            key = text.rstrip("\x00")
+            if key in translations:
+                inverted.setdefault(key, []).append((name, offset, prefix))
+    return inverted
+
+
+def dead_entries(inverted, translations):
+    """
+    Translation keys that never appear in any script
+    """
+    return [japanese for japanese in translations if japanese not in inverted]
+
+
+def coverage(index, translations):
+    """
+    Per script: (japanese spans, translated spans)
+    """
+    report = {}
+    for name, entry in index["scripts"].items():
+        total = 0
+        translated = 0
+        for _, _, text in entry["spans"]:
+            key = text.rstrip("\x00")
+            if not contains_japanese(key):
+                continue
+            total += 1
+            if key in translations:
+                translated += 1
+        report[name] = (total, translated)
+    return report
+
+
+def format_prefix(prefix):
+    return "--" if prefix is None else f"{prefix:02X}"
+
+
+# ------------------------------------------------------------
+# Main
+# ------------------------------------------------------------
+
+if __name__ == "__main__":
+    """
+    - 'xenindex.py update' scans new or changed scripts
+    - 'xenindex.py lookup TEXT' scripts and offsets using a line (-p for partial match)
+    - 'xenindex.py dead' translation entries that match nothing
+    - 'xenindex.py coverage' translated spans per script
+    The index is updated before every query.
+    """
+    parser = argparse.ArgumentParser(description="Inverted index of translation keys over the scripts.")
+
+    parser.add_argument("mode", choices=["update", "lookup", "dead", "coverage"], help="Action")
+    parser.add_argument("text", nargs="?", help="Japanese text to look up")
+
+    parser.add_argument(
+        "-t", "--translation",
+        default="../translation/_script-japanese.txt",
+        help="Path to translation file. Default: (../translation/_script-japanese.txt)"
+    )
+
+    parser.add_argument(
+        "-s", "--scripts",
+        default="../scripts_cc",
+        help="Directory with the .U.CC scripts. Default: (../scripts_cc)"
+    )
+
+    parser.add_argument(
+        "-i", "--index",
+        default="../translation/_script-index.json",
+        help="Path to index file. Default: (../translation/_script-index.json)"
+    )
+
+    parser.add_argument(
+        "-p", "--partial",
+        action="store_true",
+        help="Lookup keys containing the text."
+    )
+
+    parser.add_argument("-j", "--jobs", type=int, help="Number of worker processes. Default: (CPU count)")
+
+    args = parser.parse_args()
+
+    index = load_index(args.index)
+    changed = update_index(index, args.scripts, jobs=args.jobs)
+    if changed:
+        save_index(args.index, index)
+
+    if args.mode == "update":
+        print(f"{len(changed)} script(s) scanned, {len(index['scripts'])} in index")
+
+    else:
+        translations = load_translations(args.translation)
+        inverted = invert(index, translations)
+
+        if args.mode == "lookup":
+            if not args.text:
+                parser.error("lookup needs the text to look up")
+
+            if args.partial:
+                keys = [key for key in inverted if args.text in key]
+            else:
+                keys = [args.text] if args.text in inverted else []
+
+            for key in keys:
+                print(f"//{key}")
+                print(translations[key])
+                for name, offset, prefix in inverted[key]:
+                    print(f"    {name} 0x{offset:05X} [{format_prefix(prefix)}]")
+
+            if not keys:
+                print("Not found.")
+
+        elif args.mode == "dead":
+            dead = dead_entries(inverted, translations)
+            for japanese in dead:
+                print(f"//{japanese}")
+            print(f"{len(dead)} of {len(translations)} entries never match")
+
+        else:
+            total_all = 0
+            translated_all = 0
+            for name, (total, translated) in sorted(coverage(index, translations).items()):
+                total_all += total
+                translated_all += translated
+                percent = 100 * translated / total if total else 100
+                print(f"{name:<14} {translated:>5}/{total:<5} {percent:6.2f}%")
+            percent = 100 * translated_all / total_all if total_all else 100
+            print(f"{'Total':<14} {translated_all:>5}/{total_all:<5} {percent:6.2f}%")
@@ -0,0 +1,567 @@
+#!/bin/python
+#
+# Python port of the LZSS coder used by xenon_lzss.exe
+# (see code/xenon_script_decomp.cpp, based on Okumura's LZSS.C)
+#
+# The game's .CC files are a 0x18 bytes header followed by the
+# LZSS stream. The header holds the uncompressed size at 0x14.
+# Original files start with 'LCZ', files from xenon_lzss.exe
+# leave the rest of the header zeroed.
+#
+# The decoder can also run as a generator, and keep checkpoints
+# of the ring buffer in a sidecar index (ex: S0104.CC.idx) so any
+# offset of the .U.CC can be read without decoding from the start.
+#
+
+import zlib
+import struct
+import argparse
+from pathlib import Path
+
+N = 4096        # size of ring buffer
+F = 18          # upper limit for match_length
+THRESHOLD = 2   # encode string into position and length if match_length is greater than this
+NIL = N         # index for root of binary search trees
+
+HEADER_SIZE = 0x18
+SIZE_OFFSET = 0x14
+
+INDEX_MAGIC = b'XLZI'
+INDEX_VERSION = 1
+INDEX_INTERVAL = 2048   # uncompressed bytes between checkpoints
+
+
+def read_header(data: bytes):
+    """
+    Returns (magic, uncompressed_size) from a .CC header
+    """
+    magic = data[:3]
+    size = struct.unpack_from("<I", data, SIZE_OFFSET)[0]
+    return magic, size
+
+
+def make_header(size: int) -> bytes:
+    """
+    Header the way xenon_lzss.exe writes it
+    """
+    return bytes(SIZE_OFFSET) + struct.pack("<I", size)
+
+
+# ------------------------------------------------------------
+# Decoder
+# ------------------------------------------------------------
+
+def _iter_groups(data: bytes, checkpoint=None):
+    """
+    Decodes one flag byte and its (up to 8) codes at a time
+    Yields (chunk, in_pos, out_pos, r, text_buf) where the positions
+    and the live ring buffer are the state after the chunk, which is
+    also the state a checkpoint needs to restart from there
+    """
+    if checkpoint is None:
+        text_buf = bytearray(b' ' * N)
+        r = N - F
+        pos = HEADER_SIZE
+        out_pos = 0
+    else:
+        out_pos, pos, r, ring = checkpoint
+        text_buf = bytearray(ring)
+
+    length = len(data)
+
+    while pos < length:
+        flags = data[pos] | 0xFF00
+        pos += 1
+        chunk = bytearray()
+
+        while flags & 256:
+            if flags & 1:
+                if pos >= length:
+                    break
+                c = data[pos]
+                pos += 1
+                chunk.append(c)
+                text_buf[r] = c
+                r = (r + 1) & (N - 1)
+            else:
+                if pos + 1 >= length:
+                    pos = length
+                    break
+                i = data[pos]
+                j = data[pos + 1]
+                pos += 2
+                i |= (j & 0xF0) << 4
+                j = (j & 0x0F) + THRESHOLD
+                for k in range(j + 1):
+                    c = text_buf[(i + k) & (N - 1)]
+                    chunk.append(c)
+                    text_buf[r] = c
+                    r = (r + 1) & (N - 1)
+            flags >>= 1
+
+        out_pos += len(chunk)
+        yield bytes(chunk), pos, out_pos, r, text_buf
+
+
+def iter_decode(data: bytes, checkpoint=None):
+    """
+    Generator version of decode(), yields the .U.CC bytes as they are decoded
+    Starts from the beginning, or from a checkpoint of build_index()
+    """
+    for chunk, _, _, _, _ in _iter_groups(data, checkpoint):
+        yield chunk
+
+
+def decode(data: bytes) -> bytes:
+    """
+    Decodes a whole .CC file (header included) into .U.CC bytes
+    """
+    return b''.join(iter_decode(data))
+
+
+# ------------------------------------------------------------
+# Random access
+# ------------------------------------------------------------
+
+def build_index(data: bytes, interval=INDEX_INTERVAL):
+    """
+    Decodes the file once and keeps a checkpoint every 'interval' bytes:
+    [
+        (out_pos, in_pos, r, ring_buffer), ...
+    ]
+    """
+    checkpoints = []
+    next_checkpoint = interval
+
+    for _, in_pos, out_pos, r, text_buf in _iter_groups(data):
+        if out_pos >= next_checkpoint and in_pos < len(data):
+            checkpoints.append((out_pos, in_pos, r, bytes(text_buf)))
+            next_checkpoint = out_pos + interval
+
+    return checkpoints
+
+
+def find_checkpoint(checkpoints, offset):
+    """
+    Last checkpoint at or before the uncompressed offset, None for the start of file
+    """
+    found = None
+    for checkpoint in checkpoints:
+        if checkpoint[0] > offset:
+            break
+        found = checkpoint
+    return found
+
+
+def read_range(data: bytes, offset, size, checkpoints=()):
+    """
+    Returns 'size' bytes of the .U.CC starting at 'offset'
+    Only decodes from the nearest checkpoint up to offset + size
+    """
+    checkpoint = find_checkpoint(checkpoints, offset)
+    out_pos = checkpoint[0] if checkpoint else 0
+    end = offset + size
+
+    output = bytearray()
+    for chunk in iter_decode(data, checkpoint):
+        output.extend(chunk)
+        out_pos += len(chunk)
+        if out_pos >= end:
+            break
+
+    start = offset - (checkpoint[0] if checkpoint else 0)
+    return bytes(output[start:start + size])
+
+
+def index_path(path):
+    """
+    S0104.CC -> S0104.CC.idx
+    """
+    path = Path(path)
+    return path.with_name(path.name + ".idx")
+
+
+def save_index(path, data: bytes, checkpoints, interval=INDEX_INTERVAL):
+    """
+    Sidecar index format (little endian):
+        'XLZI', version (H), interval (I), size of .CC (I), crc32 of .CC (I), checkpoints (I)
+        per checkpoint: out_pos (I), in_pos (I), r (H), length (I), zlib ring buffer
+    """
+    output = bytearray()
+    output.extend(INDEX_MAGIC)
+    output.extend(struct.pack("<HIIII", INDEX_VERSION, interval, len(data), zlib.crc32(data), len(checkpoints)))
+
+    for out_pos, in_pos, r, ring in checkpoints:
+        packed = zlib.compress(ring)
+        output.extend(struct.pack("<IIHI", out_pos, in_pos, r, len(packed)))
+        output.extend(packed)
+
+    with open(path, "wb") as f:
+        f.write(output)
+
+
+def load_index(path, data: bytes):
+    """
+    Reads a sidecar index, None if it is missing or doesn't belong to 'data'
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+
+    with open(path, "rb") as f:
+        raw = f.read()
+
+    if raw[:4] != INDEX_MAGIC:
+        return None
+
+    pos = 4
+    checkpoints = []
+
+    try:
+        version, _, size, crc, count = struct.unpack_from("<HIIII", raw, pos)
+        pos += struct.calcsize("<HIIII")
+
+        if version != INDEX_VERSION or size != len(data) or crc != zlib.crc32(data):
+            return None
+
+        for _ in range(count):
+            out_pos, in_pos, r, packed_size = struct.unpack_from("<IIHI", raw, pos)
+            pos += struct.calcsize("<IIHI")
+            if pos + packed_size > len(raw):
+                return None
+            ring = zlib.decompress(raw[pos:pos + packed_size])
+            pos += packed_size
+            if len(ring) != N:
+                return None
+            checkpoints.append((out_pos, in_pos, r, ring))
+
+    except (struct.error, zlib.error):
+        # Truncated or corrupt, get_index() builds it again
+        return None
+
+    return checkpoints
+
+
+def get_index(path, data: bytes, interval=INDEX_INTERVAL):
+    """
+    Loads the sidecar index of a .CC file, building it when missing or stale
+    """
+    checkpoints = load_index(index_path(path), data)
+
+    if checkpoints is None:
+        checkpoints = build_index(data, interval)
+        save_index(index_path(path), data, checkpoints, interval)
+
+    return checkpoints
+
+
+def first_difference(data_a: bytes, data_b: bytes):
+    """
+    Streams both files and returns the first uncompressed offset where they differ,
+    None if they decode to the same bytes
+    """
+    stream_a = iter_decode(data_a)
+    stream_b = iter_decode(data_b)
+    buffer_a = b''
+    buffer_b = b''
+    offset = 0
+
+    while True:
+        if not buffer_a:
+            buffer_a = next(stream_a, b'')
+        if not buffer_b:
+            buffer_b = next(stream_b, b'')
+
+        if not buffer_a or not buffer_b:
+            if buffer_a or buffer_b:
+                return offset
+            return None
+
+        common = min(len(buffer_a), len(buffer_b))
+        for i in range(common):
+            if buffer_a[i] != buffer_b[i]:
+                return offset + i
+
+        offset += common
+        buffer_a = buffer_a[common:]
+        buffer_b = buffer_b[common:]
+
+
+# ------------------------------------------------------------
+# Encoder
+# ------------------------------------------------------------
+
+class _Encoder:
+    """
+    Binary search tree encoder, straight from LZSS.C so the output
+    is byte for byte the same as xenon_lzss.exe
+    """
+
+    def __init__(self):
+        self.text_buf = bytearray(N + F - 1)
+        self.lson = [NIL] * (N + 1)
+        self.rson = [NIL] * (N + 257)
+        self.dad = [NIL] * (N + 1)
+        self.match_position = 0
+        self.match_length = 0
+
+    def insert_node(self, r):
+        text_buf = self.text_buf
+        lson = self.lson
+        rson = self.rson
+        dad = self.dad
+
+        cmp = 1
+        p = N + 1 + text_buf[r]
+        rson[r] = lson[r] = NIL
+        self.match_length = 0
+
+        while True:
+            if cmp >= 0:
+                if rson[p] != NIL:
+                    p = rson[p]
+                else:
+                    rson[p] = r
+                    dad[r] = p
+                    return
+            else:
+                if lson[p] != NIL:
+                    p = lson[p]
+                else:
+                    lson[p] = r
+                    dad[r] = p
+                    return
+
+            i = 1
+            cmp = 0
+            while i < F:
+                cmp = text_buf[r + i] - text_buf[p + i]
+                if cmp != 0:
+                    break
+                i += 1
+
+            if i > self.match_length:
+                self.match_position = p
+                self.match_length = i
+                if i >= F:
+                    break
+
+        dad[r] = dad[p]
+        lson[r] = lson[p]
+        rson[r] = rson[p]
+        dad[lson[p]] = r
+        dad[rson[p]] = r
+        if rson[dad[p]] == p:
+            rson[dad[p]] = r
+        else:
+            lson[dad[p]] = r
+        dad[p] = NIL
+
+    def delete_node(self, p):
+        lson = self.lson
+        rson = self.rson
+        dad = self.dad
+
+        if dad[p] == NIL:
+            return
+        if rson[p] == NIL:
+            q = lson[p]
+        elif lson[p] == NIL:
+            q = rson[p]
+        else:
+            q = lson[p]
+            if rson[q] != NIL:
+                while rson[q] != NIL:
+                    q = rson[q]
+                rson[dad[q]] = lson[q]
+                dad[lson[q]] = dad[q]
+                lson[q] = lson[p]
+                dad[lson[p]] = q
+            rson[q] = rson[p]
+            dad[rson[p]] = q
+        dad[q] = dad[p]
+        if rson[dad[p]] == p:
+            rson[dad[p]] = q
+        else:
+            lson[dad[p]] = q
+        dad[p] = NIL
+
+    def encode(self, data: bytes) -> bytes:
+        text_buf = self.text_buf
+        output = bytearray()
+        code_buf = bytearray(17)
+        code_buf_ptr = 1
+        mask = 1
+
+        s = 0
+        r = N - F
+        for i in range(s, r):
+            text_buf[i] = 0x20
+
+        pos = 0
+        length = len(data)
+
+        ln = 0
+        while ln < F and pos < length:
+            text_buf[r + ln] = data[pos]
+            pos += 1
+            ln += 1
+
+        if ln == 0:
+            return bytes(output)
+
+        for i in range(1, F + 1):
+            self.insert_node(r - i)
+        self.insert_node(r)
+
+        while ln > 0:
+            if self.match_length > ln:
+                self.match_length = ln
+
+            if self.match_length <= THRESHOLD:
+                self.match_length = 1
+                code_buf[0] |= mask
+                code_buf[code_buf_ptr] = text_buf[r]
+                code_buf_ptr += 1
+            else:
+                code_buf[code_buf_ptr] = self.match_position & 0xFF
+                code_buf[code_buf_ptr + 1] = (
+                    ((self.match_position >> 4) & 0xF0)
+                    | (self.match_length - (THRESHOLD + 1))
+                )
+                code_buf_ptr += 2
+
+            mask = (mask << 1) & 0xFF
+            if mask == 0:
+                output.extend(code_buf[:code_buf_ptr])
+                code_buf[0] = 0
+                code_buf_ptr = 1
+                mask = 1
+
+            last_match_length = self.match_length
+
+            i = 0
+            while i < last_match_length and pos < length:
+                c = data[pos]
+                pos += 1
+                self.delete_node(s)
+                text_buf[s] = c
+                if s < F - 1:
+                    text_buf[s + N] = c
+                s = (s + 1) & (N - 1)
+                r = (r + 1) & (N - 1)
+                self.insert_node(r)
+                i += 1
+
+            while i < last_match_length:
+                i += 1
+                self.delete_node(s)
+                s = (s + 1) & (N - 1)
+                r = (r + 1) & (N - 1)
+                ln -= 1
+                if ln:
+                    self.insert_node(r)
+
+        if code_buf_ptr > 1:
+            output.extend(code_buf[:code_buf_ptr])
+
+        return bytes(output)
+
+
+def encode(data: bytes) -> bytes:
+    """
+    Encodes .U.CC bytes into a whole .CC file (header included)
+    """
+    return make_header(len(data)) + _Encoder().encode(data)
+
+
+# ------------------------------------------------------------
+# Main
+# ------------------------------------------------------------
+
+if __name__ == "__main__":
+    """
+    Same usage as xenon_lzss.exe
+    - 'xenlzss.py e file1 file2' encodes file1 into file2
+    - 'xenlzss.py d file2 file1' decodes file2 into file1
+    Plus
+    - 'xenlzss.py i file.CC' builds the sidecar index file.CC.idx
+    - 'xenlzss.py p file.CC offset size' prints a range of the decoded file
+    - 'xenlzss.py c file1.CC file2.CC' shows where two files start to differ
+    """
+    parser = argparse.ArgumentParser(description="LZSS coder for Xenon .CC files.")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    for mode, description in (("e", "Encode .U.CC into .CC"), ("d", "Decode .CC into .U.CC")):
+        subparser = subparsers.add_parser(mode, help=description)
+        subparser.add_argument("input_file", help="Path to input file")
+        subparser.add_argument("output_file", help="Path to output file")
+
+    subparser = subparsers.add_parser("i", help="Build the checkpoint index of a .CC")
+    subparser.add_argument("input_file", help="Path to .CC file")
+    subparser.add_argument(
+        "--interval",
+        type=lambda value: int(value, 0),
+        default=INDEX_INTERVAL,
+        help=f"Uncompressed bytes between checkpoints. Default: ({INDEX_INTERVAL})"
+    )
+
+    subparser = subparsers.add_parser("p", help="Print a range of the decoded .CC")
+    subparser.add_argument("input_file", help="Path to .CC file")
+    subparser.add_argument("offset", type=lambda value: int(value, 0), help="Uncompressed offset (ex: 0x1A00)")
+    subparser.add_argument("size", type=lambda value: int(value, 0), nargs="?", default=0x100, help="Bytes to print. Default: (0x100)")
+    subparser.add_argument("--no-index", action="store_true", help="Don't use or create the sidecar index.")
+
+    subparser = subparsers.add_parser("c", help="Compare two .CC files")
+    subparser.add_argument("input_file", help="Path to first .CC file")
+    subparser.add_argument("other_file", help="Path to second .CC file")
+    subparser.add_argument("size", type=lambda value: int(value, 0), nargs="?", default=0x40, help="Bytes to print from the difference. Default: (0x40)")
+
+    args = parser.parse_args()
+
+    input_path = Path(args.input_file)
+
+    with open(input_path, "rb") as f:
+        data = f.read()
+
+    if args.mode in ("e", "d"):
+        if args.mode == "e":
+            processed = encode(data)
+        else:
+            processed = decode(data)
+
+        with open(Path(args.output_file), "wb") as f:
+            f.write(processed)
+
+        print(f"In : {len(data)} bytes")
+        print(f"Out: {len(processed)} bytes")
+
+    elif args.mode == "i":
+        checkpoints = build_index(data, args.interval)
+        save_index(index_path(input_path), data, checkpoints, args.interval)
+        print(f"{len(checkpoints)} checkpoints written to {index_path(input_path)}")
+
+    elif args.mode == "p":
+        checkpoints = () if args.no_index else get_index(input_path, data)
+        chunk = read_range(data, args.offset, args.size, checkpoints)
+
+        for i in range(0, len(chunk), 16):
+            line = chunk[i:i + 16]
+            print(f"{args.offset + i:08X}: {line.hex(' '):<47}")
+        print()
+        print(chunk.decode("shift_jis", errors="replace"))
+
+    else:
+        with open(Path(args.other_file), "rb") as f:
+            other = f.read()
+
+        offset = first_difference(data, other)
+
+        if offset is None:
+            print("Files decode to the same data.")
+        else:
+            print(f"First difference at 0x{offset:X}")
+            for name, content in ((input_path.name, data), (Path(args.other_file).name, other)):
+                chunk = read_range(content, offset, args.size)
+                print(f"{name}: {chunk.hex(' ')}")
+                print(f"{name}: {chunk.decode('shift_jis', errors='replace')}")
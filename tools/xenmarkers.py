@@ -0,0 +1,242 @@
+#!/bin/python
+#
+# Finds the marker passes for xenreplacer.py from the scripts
+#
+# 1. Counts, over every .U.CC in ../scripts_cc, each byte found before
+#    0xFD <len> and how many of those spans are translation keys.
+# 2. Runs the whole pipeline of merger.sh in memory (replacer passes,
+#    extra-xenreplacer.py twice, hard-to-parse-strings.py), greedily
+#    picking the pass that leaves the fewest translation keys in the
+#    final output, until no pass lowers that count. The output of the
+#    built-in passes is only compared, for the report.
+# 3. Writes the picked passes, in order, to markers.txt, which
+#    xenreplacer.py loads instead of its built-in list.
+#
+
+import argparse
+import importlib.util
+from collections import Counter
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from xenreplacer import load_translations, process_markers, LINE_MARKER, DEFAULT_MARKERS
+from xenindex import iter_spans
+
+
+def _load_tool(name, filename):
+    """
+    Imports the tools whose file name isn't a module name
+    """
+    spec = importlib.util.spec_from_file_location(name, Path(__file__).parent / filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+extra_xenreplacer = _load_tool("extra_xenreplacer", "extra-xenreplacer.py")
+hard_to_parse_strings = _load_tool("hard_to_parse_strings", "hard-to-parse-strings.py")
+
+_translations = None
+
+
+def _init_worker(translation_file):
+    global _translations
+    _translations = load_translations(translation_file)
+
+
+# ------------------------------------------------------------
+# Corpus statistics
+# ------------------------------------------------------------
+
+def count_contexts(path):
+    """
+    Worker: returns (total, translatable) counters keyed by the byte before 0xFD <len>
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    total = Counter()
+    translatable = Counter()
+
+    for _, prefix, text in iter_spans(data):
+        if prefix is None:
+            continue
+        total[prefix] += 1
+        if text.rstrip("\x00") in _translations:
+            translatable[prefix] += 1
+
+    return total, translatable
+
+
+# ------------------------------------------------------------
+# Pipeline
+# ------------------------------------------------------------
+
+def finish_pipeline(data: bytes) -> bytes:
+    """
+    What merger.sh runs after xenreplacer.py
+    """
+    data = extra_xenreplacer.process_binary_stream(data, _translations)
+    data = extra_xenreplacer.process_binary_stream(data, _translations)
+
+    for japanese, english in hard_to_parse_strings.issue_string.items():
+        data = data.replace(japanese.encode("shift_jis"), english.encode("shift_jis"))
+
+    return data
+
+
+def run_pipeline(data: bytes, markers) -> bytes:
+    """
+    Worker: final output of the script with these passes
+    """
+    return finish_pipeline(process_markers(data, _translations, markers))
+
+
+def remaining_keys(data: bytes):
+    """
+    Translation keys still in the final output
+    """
+    return sum(1 for _, _, text in iter_spans(data) if text.rstrip("\x00") in _translations)
+
+
+# ------------------------------------------------------------
+# Greedy selection
+# ------------------------------------------------------------
+
+def evaluate_script(data: bytes, reference: bytes, candidates):
+    """
+    Worker: {marker: (keys left, same output as reference, data after the pass)} for one script
+    """
+    results = {}
+    for marker in candidates:
+        processed = process_markers(data, _translations, [marker])
+        final = finish_pipeline(processed)
+        results[marker] = (remaining_keys(final), final == reference, processed)
+    return results
+
+
+def select_markers(scripts, references, candidates, executor, verbose=False):
+    """
+    Greedy set cover over the passes, scored on the final output of the pipeline
+    Stops when no pass lowers the translation keys left
+    Returns (reference keys left, [(marker, keys left, identical scripts), ...] in pass order)
+    - identical scripts: final output same as the reference (built-in passes), only reported
+    """
+    scripts = list(scripts)
+    candidates = list(candidates)
+    selected = []
+
+    target = sum(executor.map(remaining_keys, references))
+    current = sum(executor.map(remaining_keys, executor.map(run_pipeline, scripts, [[]] * len(scripts))))
+
+    while candidates:
+        results = list(executor.map(evaluate_script, scripts, references, [candidates] * len(scripts)))
+
+        scores = {marker: sum(result[marker][0] for result in results) for marker in candidates}
+
+        best = min(candidates, key=lambda marker: scores[marker])
+        left = scores[best]
+        if left >= current:
+            break
+
+        identical = sum(result[best][1] for result in results)
+        if verbose:
+            print(f"[+] {best}: {left} keys left, {identical}/{len(scripts)} scripts as the built-in passes")
+
+        selected.append((best, left, identical))
+        candidates.remove(best)
+        scripts = [result[best][2] for result in results]
+        current = left
+
+    return target, selected
+
+
+def write_markers(filename, selected, target, scripts_count):
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write("# Marker passes for xenreplacer.py, in order\n")
+        f.write("# Generated by xenmarkers.py: the byte before 0xFD <len> (hex), or 'line' for the pass by lines\n")
+        f.write(f"# Picked until no pass leaves less translation keys after merger.sh, over {scripts_count} scripts\n")
+        f.write(f"# After '#': keys left, and scripts with the same output as the built-in passes ({target} keys left)\n")
+        for marker, left, identical in selected:
+            f.write(f"{marker:<8}# {left} keys left, {identical} scripts as the built-in passes\n")
+
+
+# ------------------------------------------------------------
+# Main
+# ------------------------------------------------------------
+
+if __name__ == "__main__":
+    """
+    Prints the statistics of every context and writes markers.txt
+    """
+    parser = argparse.ArgumentParser(description="Find the marker passes for xenreplacer.py.")
+
+    parser.add_argument(
+        "-t", "--translation",
+        default="../translation/_script-japanese.txt",
+        help="Path to translation file. Default: (../translation/_script-japanese.txt)"
+    )
+
+    parser.add_argument(
+        "-s", "--scripts",
+        default="../scripts_cc",
+        help="Directory with the .U.CC scripts. Default: (../scripts_cc)"
+    )
+
+    parser.add_argument(
+        "-o", "--output",
+        default="markers.txt",
+        help="Output file. Default: (markers.txt)"
+    )
+
+    parser.add_argument("-j", "--jobs", type=int, help="Number of worker processes. Default: (CPU count)")
+
+    parser.add_argument(
+        "-v", "--verbose",
+        action="store_true",
+        help="Display every pass as it is picked."
+    )
+
+    args = parser.parse_args()
+
+    paths = sorted(Path(args.scripts).glob("*.U.CC"))
+
+    with ProcessPoolExecutor(max_workers=args.jobs, initializer=_init_worker, initargs=(args.translation,)) as executor:
+        """
+        - Statistics
+        """
+        total = Counter()
+        translatable = Counter()
+        for script_total, script_translatable in executor.map(count_contexts, paths):
+            total.update(script_total)
+            translatable.update(script_translatable)
+
+        print("Byte before 0xFD <len>: spans / translation keys")
+        for prefix, count in total.most_common():
+            print(f"    {prefix:02X}: {count:>6} / {translatable[prefix]}")
+
+        """
+        - Selection
+        """
+        candidates = [f"{prefix:02X}" for prefix in sorted(translatable) if translatable[prefix]]
+        candidates += [marker for marker in DEFAULT_MARKERS if marker not in candidates]
+
+        scripts = []
+        for path in paths:
+            with open(path, "rb") as f:
+                scripts.append(f.read())
+
+        references = list(executor.map(run_pipeline, scripts, [DEFAULT_MARKERS] * len(scripts)))
+
+        target, selected = select_markers(scripts, references, candidates, executor, args.verbose)
+
+    _, left, identical = selected[-1] if selected else (None, None, 0)
+    print(f"Keys left: {left} (built-in passes: {target}), {identical}/{len(paths)} scripts as the built-in passes")
+    if left is not None and left > target:
+        print("[-] Warning: the built-in passes leave less keys")
+
+    write_markers(args.output, selected, target, len(paths))
+
+    print(f"{len(selected)} passes (built-in: {len(DEFAULT_MARKERS)}), written to {args.output}")
+    for marker, left, identical in selected:
+        print(f"    {marker:<6} {left} keys left, {identical}/{len(paths)} scripts as the built-in passes")
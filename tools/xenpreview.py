@@ -0,0 +1,382 @@
+#!/bin/python
+#
+# Renders the translated lines with the PC-98 font of Neko Project
+# (np2/anex86.bmp, 2048x2048 1bpp) into PNG contact sheets, one
+# text window per line, so they can be reviewed without booting
+# the game.
+#
+# Font bitmap layout:
+#   - Half-width (ANK) 8x16 glyphs on the first 16 rows, x = code * 8
+#   - Full-width 16x16 glyphs from y = 512, x = (JIS row - 0x20) * 16,
+#     y = 512 + (JIS cell - 0x20) * 16
+#
+# Text that doesn't fit in the window is drawn in red.
+#
+
+import zlib
+import struct
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+FONT_SIZE = 2048
+KANJI_TOP = 512
+
+# Text window, in half-width cells
+WINDOW_COLUMNS = 60
+WINDOW_ROWS = 3
+
+PADDING = 8
+SHEET_COLUMNS = 2
+LINES_PER_SHEET = 40
+
+# Palette indexes
+BACKGROUND = 0
+TEXT = 1
+OVERFLOW = 2
+SHEET = 3
+CAPTION = 4
+
+PALETTE = [
+    (0x00, 0x00, 0x00),   # window background
+    (0xFF, 0xFF, 0xFF),   # text
+    (0xFF, 0x40, 0x40),   # text outside the window
+    (0x30, 0x30, 0x50),   # sheet background
+    (0xA0, 0xA0, 0xA0),   # caption
+]
+
+
+# ------------------------------------------------------------
+# Translation Loader
+# ------------------------------------------------------------
+
+def load_entries(filename):
+    """
+    Like load_translations() from xenreplacer.py, but keeps order and line numbers:
+    [
+        (line_number, "Japanese sentence", "English translation"), ...
+    ]
+    """
+    entries = []
+
+    with open(filename, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+
+    i = 0
+    while i < len(lines):
+        line = lines[i].rstrip("\n")
+
+        if line.startswith("//") and i + 1 < len(lines):
+            entries.append((i + 2, line[2:], lines[i + 1].rstrip("\n")))
+            i += 2
+        else:
+            i += 1
+
+    return entries
+
+
+# ------------------------------------------------------------
+# Glyph atlas
+# ------------------------------------------------------------
+
+class GlyphAtlas:
+    """
+    Font bitmap loaded once, glyph rows cached as ready to copy pixel rows
+    """
+
+    def __init__(self, font_path):
+        with open(font_path, "rb") as f:
+            data = f.read()
+
+        if data[:2] != b'BM':
+            raise ValueError(f"{font_path} is not a BMP file")
+
+        offset = struct.unpack_from("<I", data, 10)[0]
+        width, height = struct.unpack_from("<ii", data, 18)
+        bits = struct.unpack_from("<H", data, 28)[0]
+
+        if width != FONT_SIZE or abs(height) != FONT_SIZE or bits != 1:
+            raise ValueError(f"{font_path} is not a {FONT_SIZE}x{FONT_SIZE} 1bpp font bitmap")
+
+        self.data = data
+        self.offset = offset
+        self.stride = FONT_SIZE // 8
+        self.bottom_up = height > 0
+        self.cache = {}
+
+    def row_bytes(self, x, y, width_bytes) -> bytes:
+        """
+        Font pixels, 1 = ink (the bitmap stores ink as 0)
+        """
+        row = FONT_SIZE - 1 - y if self.bottom_up else y
+        start = self.offset + row * self.stride + x // 8
+        return bytes(b ^ 0xFF for b in self.data[start:start + width_bytes])
+
+    def glyph(self, code, color):
+        """
+        Returns (width, rows) for a Shift-JIS code (one or two bytes),
+        every row is a bytes object of palette indexes
+        """
+        key = (code, color)
+        if key in self.cache:
+            return self.cache[key]
+
+        if code < 0x100:
+            width = 8
+            x, y = code * 8, 0
+        else:
+            width = 16
+            jis_row, jis_cell = sjis_to_jis(code >> 8, code & 0xFF)
+            x = (jis_row - 0x20) * 16
+            y = KANJI_TOP + (jis_cell - 0x20) * 16
+
+        rows = []
+        for line in range(16):
+            if 0 <= x < FONT_SIZE and 0 <= y + line < FONT_SIZE:
+                bits = int.from_bytes(self.row_bytes(x, y + line, width // 8), "big")
+            else:
+                bits = 0
+            rows.append(bytes(
+                color if bits & (1 << (width - 1 - px)) else BACKGROUND
+                for px in range(width)
+            ))
+
+        self.cache[key] = (width, rows)
+        return self.cache[key]
+
+
+def sjis_to_jis(b1, b2):
+    """
+    Ex: 0x82A0 (あ) -> (0x24, 0x22)
+    """
+    if b1 >= 0xE0:
+        b1 -= 0x40
+    row = (b1 - 0x81) * 2 + 0x21
+
+    if b2 >= 0x9F:
+        return row + 1, b2 - 0x7E
+
+    cell = b2 - 0x1F
+    if b2 >= 0x80:
+        cell -= 1
+    return row, cell
+
+
+def iter_codes(data: bytes):
+    """
+    Shift-JIS bytes -> one or two byte codes
+    """
+    pos = 0
+    while pos < len(data):
+        b1 = data[pos]
+        if ((0x81 <= b1 <= 0x9F) or (0xE0 <= b1 <= 0xFC)) and pos + 1 < len(data):
+            yield (b1 << 8) | data[pos + 1]
+            pos += 2
+        else:
+            yield b1
+            pos += 1
+
+
+# ------------------------------------------------------------
+# Layout
+# ------------------------------------------------------------
+
+def layout(text: str, columns):
+    """
+    Splits a line in rows of half-width cells, like the game does
+    (no word wrapping, a full-width char is never split)
+    Literal '\\n' in the translation is a line break
+    Returns [[code, ...], ...]
+    """
+    rows = []
+
+    for paragraph in text.split("\\n"):
+        row = []
+        used = 0
+
+        for code in iter_codes(paragraph.encode("shift_jis", errors="replace")):
+            cells = 2 if code > 0xFF else 1
+            if used + cells > columns:
+                rows.append(row)
+                row = []
+                used = 0
+            row.append(code)
+            used += cells
+
+        rows.append(row)
+
+    return rows
+
+
+class Canvas:
+    """
+    8 bit palette image
+    """
+
+    def __init__(self, width, height, color=SHEET):
+        self.width = width
+        self.height = height
+        self.pixels = bytearray([color]) * (width * height)
+
+    def fill(self, x, y, width, height, color):
+        row = bytes([color]) * width
+        for line in range(y, y + height):
+            start = line * self.width + x
+            self.pixels[start:start + width] = row
+
+    def draw_text(self, atlas, x, y, codes, color, max_x=None):
+        for code in codes:
+            width, rows = atlas.glyph(code, color)
+            if max_x is not None and x + width > max_x:
+                break
+            for line, pixels in enumerate(rows):
+                start = (y + line) * self.width + x
+                self.pixels[start:start + width] = pixels
+            x += width
+
+    def save_png(self, path):
+        def chunk(kind, payload):
+            return (
+                struct.pack(">I", len(payload)) + kind + payload +
+                struct.pack(">I", zlib.crc32(kind + payload) & 0xFFFFFFFF)
+            )
+
+        raw = bytearray()
+        for line in range(self.height):
+            raw.append(0)
+            raw.extend(self.pixels[line * self.width:(line + 1) * self.width])
+
+        with open(path, "wb") as f:
+            f.write(b'\x89PNG\r\n\x1a\n')
+            f.write(chunk(b'IHDR', struct.pack(">IIBBBBB", self.width, self.height, 8, 3, 0, 0, 0)))
+            f.write(chunk(b'PLTE', b''.join(bytes(color) for color in PALETTE)))
+            f.write(chunk(b'IDAT', zlib.compress(bytes(raw))))
+            f.write(chunk(b'IEND', b''))
+
+
+# ------------------------------------------------------------
+# Rendering
+# ------------------------------------------------------------
+
+_atlas = None
+
+
+def _init_worker(font_path):
+    global _atlas
+    _atlas = GlyphAtlas(font_path)
+
+
+def render_sheet(entries, output_path, columns=WINDOW_COLUMNS, rows=WINDOW_ROWS):
+    """
+    Renders one contact sheet: caption (line number) and text window per entry
+    Returns the line numbers of the entries that overflow the window
+    """
+    window_width = columns * 8
+    window_height = rows * 16
+    cell_width = window_width + PADDING * 2
+    cell_height = 16 + window_height + PADDING * 2
+
+    sheet_rows = (len(entries) + SHEET_COLUMNS - 1) // SHEET_COLUMNS
+    canvas = Canvas(cell_width * SHEET_COLUMNS + PADDING, cell_height * sheet_rows + PADDING)
+
+    overflows = []
+
+    for i, (line_number, _, english) in enumerate(entries):
+        x = PADDING + (i % SHEET_COLUMNS) * cell_width
+        y = PADDING + (i // SHEET_COLUMNS) * cell_height
+
+        text_rows = layout(english, columns)
+        overflow = len(text_rows) > rows
+        if overflow:
+            overflows.append(line_number)
+
+        caption = f"{line_number}" + (f" +{len(text_rows) - rows} row(s)" if overflow else "")
+        canvas.draw_text(_atlas, x, y, caption.encode("ascii"), OVERFLOW if overflow else CAPTION, x + window_width)
+
+        canvas.fill(x, y + 16, window_width, window_height, BACKGROUND)
+        for row_number, codes in enumerate(text_rows[:rows]):
+            color = OVERFLOW if overflow and row_number == rows - 1 else TEXT
+            canvas.draw_text(_atlas, x, y + 16 + row_number * 16, codes, color)
+
+    canvas.save_png(output_path)
+    return overflows
+
+
+def render_all(entries, output_dir, font_path, columns=WINDOW_COLUMNS, rows=WINDOW_ROWS,
+               per_sheet=LINES_PER_SHEET, jobs=None):
+    """
+    Splits the entries in sheets and renders them in parallel
+    Returns (sheet paths, overflowing line numbers)
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    batches = [entries[i:i + per_sheet] for i in range(0, len(entries), per_sheet)]
+    paths = [output_dir / f"preview_{number:04d}.png" for number in range(len(batches))]
+
+    overflows = []
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(str(font_path),)) as executor:
+        results = executor.map(
+            render_sheet,
+            batches,
+            [str(path) for path in paths],
+            [columns] * len(batches),
+            [rows] * len(batches)
+        )
+        for result in results:
+            overflows.extend(result)
+
+    return paths, overflows
+
+
+# ------------------------------------------------------------
+# Main
+# ------------------------------------------------------------
+
+if __name__ == "__main__":
+    """
+    Renders every translated line (or the ones matching --match) to ../preview
+    """
+    parser = argparse.ArgumentParser(description="Render translated lines with the PC-98 font.")
+
+    parser.add_argument(
+        "-t", "--translation",
+        default="../translation/_script-japanese.txt",
+        help="Path to translation file. Default: (../translation/_script-japanese.txt)"
+    )
+
+    parser.add_argument(
+        "-f", "--font",
+        default="np2/anex86.bmp",
+        help="Path to font bitmap. Default: (np2/anex86.bmp)"
+    )
+
+    parser.add_argument(
+        "-o", "--output",
+        default="../preview",
+        help="Output directory. Default: (../preview)"
+    )
+
+    parser.add_argument(
+        "-m", "--match",
+        help="Only lines whose Japanese or English text contains this."
+    )
+
+    parser.add_argument("--columns", type=int, default=WINDOW_COLUMNS, help=f"Text window width in half-width chars. Default: ({WINDOW_COLUMNS})")
+    parser.add_argument("--rows", type=int, default=WINDOW_ROWS, help=f"Text window height in lines. Default: ({WINDOW_ROWS})")
+    parser.add_argument("--per-sheet", type=int, default=LINES_PER_SHEET, help=f"Lines per PNG. Default: ({LINES_PER_SHEET})")
+    parser.add_argument("-j", "--jobs", type=int, help="Number of worker processes. Default: (CPU count)")
+
+    args = parser.parse_args()
+
+    entries = load_entries(args.translation)
+    if args.match:
+        entries = [entry for entry in entries if args.match in entry[1] or args.match in entry[2]]
+
+    paths, overflows = render_all(
+        entries, args.output, args.font, args.columns, args.rows, args.per_sheet, args.jobs
+    )
+
+    print(f"{len(entries)} line(s) rendered to {len(paths)} sheet(s) in {args.output}")
+    if overflows:
+        print(f"{len(overflows)} line(s) don't fit the window, at lines: {' '.join(str(n) for n in overflows)}")
@@ -10,13 +10,20 @@
 # Althought it doesn't (still) catches some less standard lines
 #
 
+import io
 import re
+import sys
 import argparse
 from pathlib import Path
 
+from xenbudget import load_limits, get_budget, script_name, check_budget, format_report, record_growth, print_growth
+
 verbose = False
 extra_verbose = False
 
+# Bytes added by every translated line, see xenbudget.record_growth
+growth = {}
+
 def load_translations(filename):
     """
     Load translations into a dictionary:
@@ -113,9 +120,9 @@ def process_line(line: bytes, translations: dict, base_pattern) -> bytes:
             decoded = part.decode("shift_jis")
 
             if decoded in translations:
-                rebuilt.extend(
-                    translations[decoded].encode("shift_jis")
-                )
+                new_bytes = translations[decoded].encode("shift_jis")
+                rebuilt.extend(new_bytes)
+                record_growth(growth, decoded, part, new_bytes)
                 replaced_any = True
             else:
                 rebuilt.extend(part)
@@ -131,17 +138,22 @@ def process_line(line: bytes, translations: dict, base_pattern) -> bytes:
     final_line = rebuilt + terminator + rest_of_line
     return bytes(final_line)
 
+def process_data_by_lines(data: bytes, translations: dict, base_pattern) -> bytes:
+    output = bytearray()
+
+    for line in io.BytesIO(data).readlines():
+        processed = process_line(line, translations, base_pattern)
+        output.extend(processed)
+
+    return bytes(output)
+
 def process_file_by_lines(input_file, translation_file, output_file, base_pattern):
     translations = load_translations(translation_file)
 
     with open(input_file, "rb") as f:
-        lines = f.readlines()
-
-    output = bytearray()
+        data = f.read()
 
-    for line in lines:
-        processed = process_line(line, translations, base_pattern)
-        output.extend(processed)
+    output = process_data_by_lines(data, translations, base_pattern)
 
     with open(output_file, "wb") as f:
         f.write(output)
@@ -206,6 +218,7 @@ def process_anomalous_string(data: bytes, translations: dict, base_pattern) -> b
             if decoded in translations:
                 new_bytes = translations[decoded].encode('shift_jis')
                 rebuilt.extend(new_bytes)
+                record_growth(growth, decoded, part, new_bytes)
             else:
                 rebuilt.extend(part)
 
@@ -222,12 +235,7 @@ def process_anomalous_string(data: bytes, translations: dict, base_pattern) -> b
     return bytes(rebuilt)
 
 
-def process_file(input_file, translation_file, output_file, base_pattern):
-    translations = load_translations(translation_file)
-
-    with open(input_file, "rb") as f:
-        data = f.read()
-
+def process_data(data: bytes, translations: dict, base_pattern) -> bytes:
     # Regex pattern:
     # 00 FD followed by any byte
     #pattern = re.compile(b'\x00\xFD(.)')
@@ -272,7 +280,10 @@ def process_file(input_file, translation_file, output_file, base_pattern):
         if stripped_text in translations:
             translated_text = translations[stripped_text]
             new_bytes = translated_text.encode("shift_jis", errors="replace")
+            # Keep the trailing null bytes, they end the string in the game
+            new_bytes += b'\x00' * (len(original_text) - len(stripped_text))
             output.extend(new_bytes)
+            record_growth(growth, stripped_text, original_bytes, new_bytes)
         else:
             # If no translation found, keep original
             output.extend(original_bytes)
@@ -285,9 +296,69 @@ def process_file(input_file, translation_file, output_file, base_pattern):
     if pos < len(data):
         output.extend(data[pos:])
 
+    return bytes(output)
+
+def process_file(input_file, translation_file, output_file, base_pattern):
+    translations = load_translations(translation_file)
+
+    with open(input_file, "rb") as f:
+        data = f.read()
+
+    output = process_data(data, translations, base_pattern)
+
     with open(output_file, "wb") as f:
         f.write(output)
 
+"""
+Markers
+"""
+
+# Passes over every file, in order:
+# the byte before 0xFD <len> (hex), or 'line' for the pass by lines.
+# Found by trial and error, xenmarkers.py can generate markers.txt from the scripts
+LINE_MARKER = "line"
+DEFAULT_MARKERS = ["00", "04", "0F", "14", LINE_MARKER, "0D", "26", "01", "40", "0A", "46"]
+
+def load_markers(filename):
+    """
+    One marker per line, '#' starts a comment
+    Ex:
+        00      # 13503 lines
+        line
+    """
+    markers = []
+
+    with open(filename, "r", encoding="utf-8") as f:
+        for line in f:
+            marker = line.split("#")[0].strip()
+            if not marker:
+                continue
+            if marker != LINE_MARKER:
+                int(marker, 16)  # fail early on bad markers
+            markers.append(marker)
+
+    return markers
+
+def marker_pattern(marker):
+    r"""
+    "04" -> rb'\x04\xFD.'
+    "line" -> rb'^\x00'
+    """
+    if marker == LINE_MARKER:
+        return rb'^\x00'
+    return re.escape(bytes([int(marker, 16)])) + rb'\xFD.'
+
+def process_markers(data: bytes, translations: dict, markers) -> bytes:
+    """
+    All the passes in memory, without the files in scripts_steps
+    """
+    for marker in markers:
+        if marker == LINE_MARKER:
+            data = process_data_by_lines(data, translations, marker_pattern(marker))
+        else:
+            data = process_data(data, translations, marker_pattern(marker))
+    return data
+
 if __name__ == "__main__":
     """
     Main loop
@@ -310,6 +381,48 @@ if __name__ == "__main__":
         help="Optional output file. Default: (../scripts_merge/auto-generated)"
     )
 
+    parser.add_argument(
+        "-m", "--markers",
+        default="markers.txt",
+        help="Marker passes file, from xenmarkers.py. Default: (markers.txt, built-in list if missing)"
+    )
+
+    parser.add_argument(
+        "-b", "--budget-dir",
+        help="Directory with the original .U.CC/.CC files used as memory budget. Default: (input file directory)"
+    )
+
+    parser.add_argument(
+        "-l", "--limits",
+        help="Per script limits file, see xenbudget.py."
+    )
+
+    parser.add_argument(
+        "--headroom",
+        type=float,
+        default=0.0,
+        help="Percent added to the original sizes. Default: (0)"
+    )
+
+    parser.add_argument(
+        "--budget",
+        action="store_true",
+        help="Display the memory budget and the lines with the biggest growth."
+    )
+
+    parser.add_argument(
+        "-s", "--strict",
+        action="store_true",
+        help="Fail when the translated script is over its memory budget."
+    )
+
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=10,
+        help="Number of lines with the biggest growth to display. Default: (10)"
+    )
+
     parser.add_argument(
         "-v", "--verbose",
         action="store_true",
@@ -348,64 +461,46 @@ if __name__ == "__main__":
         extra_verbose = True
 
     """
-    - Process files
+    - Process files, one pass per marker
     """
-    # Base pattern, 80% of the matches
-    #first_pattern = b'\x00\xFD(.)'
-    first_pattern = rb'\x00\xFD.'
-    first_path = temp_path.with_name(temp_path.name + '.S1')
-    process_file(input_path, translation_path, first_path, first_pattern)
-
-    # 2nd pattern
-    #second_pattern = rb'\x04\xFD.'
-    second_pattern = rb'\x04\xFD.'
-    second_path = temp_path.with_name(temp_path.name + '.S2')
-    process_file(first_path, translation_path, second_path, second_pattern)
-
-    # 3rd pattern
-    third_pattern = rb'\x0F\xFD.'
-    third_path = temp_path.with_name(temp_path.name + '.S3')
-    process_file(second_path, translation_path, third_path, third_pattern)
-
-    # 4th pattern
-    fourth_pattern = rb'\x14\xFD.'
-    fourth_path = temp_path.with_name(temp_path.name + '.S4')
-    process_file(third_path, translation_path, fourth_path, fourth_pattern)
-
-    # 5th pattern ## Process by lines only
-    fifth_pattern = rb'^\x00'
-    fifth_path = temp_path.with_name(temp_path.name + '.S5')
-    process_file_by_lines(fourth_path, translation_path, fifth_path, fifth_pattern)
-
-    # 6th pattern
-    sixth_pattern = rb'\x0D\xFD.'
-    sixth_path = temp_path.with_name(temp_path.name + '.S6')
-    process_file(fifth_path, translation_path, sixth_path, sixth_pattern)
-
-    # 7th pattern
-    seventh_pattern = rb'\x26\xFD.'
-    seventh_path = temp_path.with_name(temp_path.name + '.S7')
-    process_file(sixth_path, translation_path, seventh_path, seventh_pattern)
-
-    # 8th pattern
-    eigth_pattern = rb'\x01\xFD.'
-    eigth_path = temp_path.with_name(temp_path.name + '.S8')
-    process_file(seventh_path, translation_path, eigth_path, eigth_pattern)
-
-    # 9th pattern
-    nineth_pattern = rb'\x40\xFD.'
-    nineth_path = temp_path.with_name(temp_path.name + '.S9')
-    process_file(eigth_path, translation_path, nineth_path, nineth_pattern)
-
-    # 10th pattern
-    tenth_pattern = rb'\x0A\xFD.'
-    tenth_path = temp_path.with_name(temp_path.name + '.S10')
-    process_file(nineth_path, translation_path, tenth_path, tenth_pattern)
-
-    # 11th pattern
-    eleventh_pattern = rb'\x46\xFD.'
-    eleventh_path = temp_path.with_name(temp_path.name + '.S11')
-    process_file(tenth_path, translation_path, output_path, eleventh_pattern)
+    markers_path = Path(args.markers)
+    markers = load_markers(markers_path) if markers_path.exists() else DEFAULT_MARKERS
+
+    current_path = input_path
+
+    for number, marker in enumerate(markers, 1):
+        if number == len(markers):
+            step_path = output_path
+        else:
+            step_path = temp_path.with_name(temp_path.name + f'.S{number}')
+
+        if marker == LINE_MARKER:
+            process_file_by_lines(current_path, translation_path, step_path, marker_pattern(marker))
+        else:
+            process_file(current_path, translation_path, step_path, marker_pattern(marker))
+
+        current_path = step_path
+
+    """
+    - Check memory budget (only with --budget or --strict, extra-xenreplacer.py
+      still changes the file, xenbudget.py does the final check)
+    """
+    if args.budget or args.strict:
+        budget_dir = Path(args.budget_dir) if args.budget_dir else input_path.parent
+        name = script_name(input_path)
+        limits = load_limits(args.limits) if args.limits else {}
+
+        with open(output_path, "rb") as f:
+            output_data = f.read()
+
+        report = check_budget(name, output_data, get_budget(budget_dir, name, limits, args.headroom))
+
+        if report["over"] or args.budget:
+            print(format_report(report))
+            print_growth(growth, args.top)
+
+        if report["over"] and args.strict:
+            sys.exit(1)
 
 
 